@@ -1,6 +1,6 @@
 from fastapi import FastAPI, File, UploadFile, Form, BackgroundTasks
-from fastapi.responses import StreamingResponse, FileResponse, JSONResponse
-from pydantic import BaseModel
+from fastapi.responses import Response, StreamingResponse, JSONResponse
+from pydantic import BaseModel, Field
 from fastapi.middleware.cors import CORSMiddleware
 import torch
 from typing import List, Optional
@@ -8,21 +8,98 @@ import shutil
 import os
 from datetime import datetime
 import io
-from diffusers import DiffusionPipeline
-
+import re
+import asyncio
+import functools
+import threading
+from collections import deque
+import zipfile
+from urllib.parse import quote
+import aiofiles
+import multiprocessing
+import anyio
+from contextlib import asynccontextmanager
+from diffusers import DiffusionPipeline, DPMSolverMultistepScheduler
+
+from .state import RedisStatus, create_image_store, create_status_store
 from .train_lora import TrainingConfig, start_training as run_lora_training
 
-app = FastAPI()
-
-# --- In-memory store for training status ---
-# In a real-world multi-user app, you'd use a database or Redis.
-# For this local single-user app, a simple dict is sufficient.
-training_status = {
+BASE_MODEL = "runwayml/stable-diffusion-v1-5"
+DEFAULT_INFERENCE_STEPS = 25
+MAX_INFERENCE_STEPS = 100
+
+# Probe the available backends once at import instead of on every request
+if torch.backends.mps.is_available():
+    DEVICE = "mps"
+elif torch.cuda.is_available():
+    DEVICE = "cuda"
+else:
+    DEVICE = "cpu"
+
+# bf16 has fp32's exponent range, avoiding the fp16 overflows in the SD UNet's upper blocks
+# Half precision on CPU is very slow and some of its kernels are missing, so stay in fp32 there
+if DEVICE == "cuda" and torch.cuda.is_bf16_supported():
+    DTYPE = torch.bfloat16
+elif DEVICE == "cpu":
+    DTYPE = torch.float32
+else:
+    DTYPE = torch.float16
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Sync endpoints and file I/O share Starlette's threadpool; the default 40 slots
+    # are easily held up by uploads and model deletions while the frontend polls.
+    anyio.to_thread.current_default_thread_limiter().total_tokens = 64
+
+    # Load the base pipeline once at startup and reuse it for every request.
+    # Reloading multi-GB weights per call dominated inference latency.
+    app.state.pipe = DiffusionPipeline.from_pretrained(
+        BASE_MODEL,
+        torch_dtype=DTYPE,
+        use_safetensors=True,
+    ).to(DEVICE)
+    # DPM-Solver++ reaches PNDM's 50-step quality in ~20-25 steps
+    app.state.pipe.scheduler = DPMSolverMultistepScheduler.from_config(
+        app.state.pipe.scheduler.config,
+        algorithm_type="dpmsolver++",
+        use_karras_sigmas=True,
+    )
+    # Decode batched latents one image at a time to cap the VAE's peak memory.
+    # Attention already runs through torch 2 SDPA (diffusers' default processor),
+    # which stays compatible with torch.compile; slicing only pays off on MPS.
+    app.state.pipe.vae.enable_slicing()
+    if DEVICE == "mps":
+        app.state.pipe.enable_attention_slicing("auto")
+
+    # torch.compile is only stable for the UNet on CUDA; MPS/CPU run eagerly.
+    # Short warmup calls pay the compilation cost before the first real request,
+    # once per batch size the worker can form since each one records its own CUDA graphs.
+    # The eager module is kept for LoRA requests, see run_inference_task.
+    app.state.eager_unet = app.state.pipe.unet
+    if DEVICE == "cuda" and hasattr(torch, "compile"):
+        app.state.pipe.unet = torch.compile(app.state.pipe.unet, mode="reduce-overhead", fullgraph=False)
+        for batch_size in range(1, MAX_BATCH_SIZE + 1):
+            app.state.pipe(["warmup"] * batch_size, num_inference_steps=2)
+    app.state.base_unet = app.state.pipe.unet
+
+    # A single worker drains the request queue so concurrent /generate calls share UNet forwards
+    app.state.request_queue = asyncio.Queue()
+    worker = asyncio.create_task(_inference_worker(app.state.request_queue))
+    yield
+    worker.cancel()
+    del app.state.pipe
+
+app = FastAPI(lifespan=lifespan)
+
+# --- Store for training status ---
+# Shared with the training process through a multiprocessing manager; set REDIS_URL
+# to also share it across Uvicorn workers.
+training_status = create_status_store("train:status", shared=True, defaults={
     "status": "idle", # idle, initializing, loading_models, training, completed, failed
     "progress": 0,    # 0-100
     "message": "Server is ready.",
     "should_stop": False,
-}
+})
 
 # --- CORS Middleware ---
 origins = ["http://localhost:5173", "http://127.0.0.1:5173"]
@@ -40,151 +117,284 @@ class GenerateRequest(BaseModel):
     prompt: str
     negative_prompt: Optional[str] = None
     lora_model: Optional[str] = None # New field for LoRA model
+    num_inference_steps: int = Field(DEFAULT_INFERENCE_STEPS, ge=1, le=MAX_INFERENCE_STEPS)
 
 import uuid
 
-inference_status = {
+inference_status = create_status_store("inference:status", {
     "status": "idle", # idle, loading, processing, completed, failed
     "progress": 0,
     "step": 0,
-    "total_steps": 50,
+    "total_steps": DEFAULT_INFERENCE_STEPS,
     "message": "Ready for inference.",
     "image_id": None,
-}
+    "image_ids": [],
+})
 
-# In-memory store for generated images
-# In a real app, you might use a temporary file store or a cache like Redis
-generated_images = {}
+# --- Dynamic batching ---
+MAX_BATCH_SIZE = 4
+BATCH_TIMEOUT = 0.05 # Seconds to wait for more requests to join a batch
+
+# Store for generated images; entries expire after an hour and the in-memory
+# store keeps at most MAX_CACHED_IMAGES, evicting the least recently used
+generated_images = create_image_store()
 
 # ... (omitting other parts of the file for brevity)
 
-def run_inference_task(req: GenerateRequest):
-    """The actual long-running task for generating an image."""
+def run_inference_task(reqs: List[GenerateRequest]):
+    """The actual long-running task for generating a batch of images.
+
+    All requests must satisfy `_can_batch`; one image id is returned per request.
+    """
+    req = reqs[0]
+    total_steps = req.num_inference_steps
+    progress_per_step = 100 / total_steps
     inference_status.update({
         "status": "loading",
         "progress": 0,
         "step": 0,
-        "message": "Loading Stable Diffusion model...",
+        "total_steps": total_steps,
+        "message": "Preparing Stable Diffusion model...",
         "image_id": None,
+        "image_ids": [],
     })
 
+    # Runs synchronously inside the denoising loop, so it must stay cheap and
+    # return callback_kwargs per the diffusers callback_on_step_end contract.
     def progress_callback(pipe, step, timestep, callback_kwargs):
         inference_status.update({
             "status": "processing",
             "step": step,
-            "progress": (step / inference_status["total_steps"]) * 100,
-            "message": f"Inference in progress... Step {step}/{inference_status['total_steps']}",
+            "progress": step * progress_per_step,
+            "message": f"Inference in progress... Step {step}/{total_steps}",
         })
         return callback_kwargs
 
-    pipe = None
+    pipe = app.state.pipe
     try:
-        pipe = DiffusionPipeline.from_pretrained(
-            "runwayml/stable-diffusion-v1-5",
-            torch_dtype=torch.float16,
-            use_safetensors=True,
-        )
-        if torch.backends.mps.is_available():
-            pipe = pipe.to("mps")
-
         # Load LoRA weights if a model is specified
         if req.lora_model and req.lora_model != "None":
             lora_path = os.path.join("lora_models", req.lora_model)
             if os.path.isdir(lora_path):
                 inference_status["message"] = f"Loading LoRA model: {req.lora_model}..."
+                # Injecting adapters into the compiled UNet invalidates its graphs and
+                # recompiles on every load and unload, so LoRA requests run eagerly.
+                pipe.unet = app.state.eager_unet
                 pipe.load_lora_weights(lora_path)
             else:
                 raise FileNotFoundError(f"LoRA model directory not found: {lora_path}")
 
         inference_status["status"] = "processing"
-        image = pipe(
-            prompt=req.prompt,
-            negative_prompt=req.negative_prompt,
-            num_inference_steps=inference_status["total_steps"],
-            guidance_scale=7.5,
+        images = pipe(
+            prompt=[r.prompt for r in reqs],
+            # diffusers requires prompt and negative_prompt to be the same type
+            negative_prompt=None if req.negative_prompt is None else [r.negative_prompt for r in reqs],
+            num_inference_steps=total_steps,
+            guidance_scale=6.0,
             callback_on_step_end=progress_callback,
-        ).images[0]
+        ).images
+
+        image_ids = []
+        for image in images:
+            img_byte_arr = io.BytesIO()
+            image.save(img_byte_arr, format='PNG')
 
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='PNG')
-        
-        image_id = str(uuid.uuid4())
-        generated_images[image_id] = img_byte_arr.getvalue()
+            image_id = str(uuid.uuid4())
+            generated_images[image_id] = img_byte_arr.getvalue()
+            image_ids.append(image_id)
 
         inference_status.update({
             "status": "completed",
             "progress": 100,
             "message": "Image generation complete.",
-            "image_id": image_id,
+            "image_id": image_ids[0],
+            "image_ids": image_ids,
         })
+        return image_ids
 
     except Exception as e:
         print(f"Error during image generation: {e}")
         inference_status.update({"status": "failed", "message": str(e)})
+        raise
     finally:
-        if pipe is not None:
-            # Unload LoRA weights for the next request
-            pipe.unload_lora_weights()
-            del pipe
-            torch.cuda.empty_cache()
+        # Unload LoRA weights so the shared pipeline is clean for the next request
+        pipe.unload_lora_weights()
+        pipe.unet = app.state.base_unet
+
+def _can_batch(a: GenerateRequest, b: GenerateRequest) -> bool:
+    """Requests can share a pipeline call only if everything but the prompt matches."""
+    return (
+        a.negative_prompt == b.negative_prompt
+        and a.lora_model == b.lora_model
+        and a.num_inference_steps == b.num_inference_steps
+    )
+
+async def _inference_worker(queue: asyncio.Queue):
+    """Coalesce queued requests into batches and run them one batch at a time."""
+    loop = asyncio.get_running_loop()
+    pending = deque() # Requests that could not join the previous batch
+    while True:
+        first = pending.popleft() if pending else await queue.get()
+        batch, held = [first], deque()
+
+        while pending and len(batch) < MAX_BATCH_SIZE:
+            item = pending.popleft()
+            (batch if _can_batch(first[0], item[0]) else held).append(item)
+
+        deadline = loop.time() + BATCH_TIMEOUT
+        while len(batch) < MAX_BATCH_SIZE:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            (batch if _can_batch(first[0], item[0]) else held).append(item)
+
+        held.extend(pending)
+        pending = held
+
+        try:
+            image_ids = await asyncio.to_thread(run_inference_task, [req for req, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), image_id in zip(batch, image_ids):
+                if not future.done():
+                    future.set_result(image_id)
 
 @app.post("/generate")
-async def start_generation(req: GenerateRequest, background_tasks: BackgroundTasks):
-    if inference_status["status"] in ["loading", "processing"]:
-        return {"status": "error", "message": "An inference job is already in progress."}
-    
-    background_tasks.add_task(run_inference_task, req)
-    return {"status": "success", "message": "Image generation started in the background."}
+async def start_generation(req: GenerateRequest):
+    if req.lora_model and req.lora_model != "None" and not _is_safe_name(req.lora_model):
+        return {"status": "error", "message": "Invalid LoRA model name."}
+    future = asyncio.get_running_loop().create_future()
+    await app.state.request_queue.put((req, future))
+    try:
+        image_id = await future
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+    return {"status": "success", "message": "Image generation complete.", "image_id": image_id}
 
 @app.get("/generate/status")
 def get_inference_status():
-    return inference_status
-
-@app.get("/models")
-def get_lora_models():
-    models_dir = "lora_models"
-    if not os.path.exists(models_dir):
+    return inference_status.copy()
+
+# Folder names only ever contain word characters and '-': no separators, dots or
+# null bytes, so a validated name can be joined onto models_dir without traversal.
+_UNSAFE_NAME_RE = re.compile(r'[^\w-]+')
+def _is_safe_name(name: str, models_dir: str = "lora_models") -> bool:
+    """True if `name` refers to an entry directly inside models_dir.
+
+    Folders created before names were restricted to [\w-] may contain dots,
+    commas and the like, so only path traversal is rejected here.
+    """
+    if not name or "\0" in name or os.sep in name or (os.altsep and os.altsep in name):
+        return False
+    base = os.path.realpath(models_dir)
+    return os.path.dirname(os.path.realpath(os.path.join(base, name))) == base
+
+# Example folder name: sks_dog-20251017-103000 (the prompt itself may contain '-')
+_MODEL_FOLDER_RE = re.compile(r'^(.*)-(\d{8})-(\d{6})$')
+
+def _scan_lora_models(models_dir: str):
+    """Return model metadata, rescanning only when models_dir itself has changed.
+
+    Adding, removing or renaming a model folder updates the directory's mtime,
+    so polling an unchanged directory is a single os.stat call.
+    """
+    try:
+        st = os.stat(models_dir)
+    except FileNotFoundError:
         return []
+    return _scan_lora_models_cached(models_dir, st.st_mtime_ns, st.st_size)
 
-    model_folders = [d for d in os.listdir(models_dir) if os.path.isdir(os.path.join(models_dir, d))]
-    
+@functools.lru_cache(maxsize=1)
+def _scan_lora_models_cached(models_dir: str, mtime_ns: int, size: int):
+    """Collect model metadata from models_dir in a single directory pass."""
     models_info = []
-    for folder in model_folders:
-        folder_path = os.path.join(models_dir, folder)
-        # Check if the directory is empty and delete it if so
-        if not os.listdir(folder_path):
-            print(f"Found and deleting empty model directory: {folder_path}")
-            try:
-                shutil.rmtree(folder_path)
-            except OSError as e:
-                print(f"Error deleting empty directory {folder_path}: {e}")
-            continue
-
-        try:
-            # Example folder name: lora-models/sks_dog-20251017-103000
-            parts = folder.split('-')
-            prompt = parts[0].replace('_', ' ')
-            date = parts[1]
-            time = parts[2]
-            creation_time = datetime.strptime(f"{date}-{time}", "%Y%m%d-%H%M%S").isoformat()
+    with os.scandir(models_dir) as it:
+        for entry in it:
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+
+            # Check if the directory is empty and delete it if so
+            with os.scandir(entry.path) as contents:
+                is_empty = next(contents, None) is None
+            if is_empty:
+                print(f"Found and deleting empty model directory: {entry.path}")
+                try:
+                    shutil.rmtree(entry.path)
+                except OSError as e:
+                    print(f"Error deleting empty directory {entry.path}: {e}")
+                continue
+
+            match = _MODEL_FOLDER_RE.match(entry.name)
+            if match is None:
+                # Skip folders with unexpected naming conventions
+                print(f"Could not parse model folder '{entry.name}'")
+                continue
+
+            # The regex guarantees the digits, so build the ISO timestamp by slicing
+            prompt, date, time = match.groups()
+            creation_time = f"{date[0:4]}-{date[4:6]}-{date[6:8]}T{time[0:2]}:{time[2:4]}:{time[4:6]}"
 
             models_info.append({
-                "name": folder,
-                "prompt": prompt,
+                "name": entry.name,
+                "prompt": prompt.replace('_', ' '),
                 "creation_time": creation_time,
             })
-        except (IndexError, ValueError) as e:
-            # Skip folders with unexpected naming conventions
-            print(f"Could not parse model folder '{folder}': {e}")
-            continue
-            
-    # Sort models by creation time, newest first
+
+    # Sort models by creation time, newest first (ISO strings sort chronologically)
     models_info.sort(key=lambda x: x["creation_time"], reverse=True)
-    
+
     return models_info
 
+@app.get("/models")
+async def get_lora_models():
+    # Run the directory scan off the event loop so frontend polling never blocks other requests
+    return await asyncio.to_thread(_scan_lora_models, "lora_models")
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """Write-only sink that collects zip output until it is drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _iter_zip_directory(root_dir: str, chunk_size: int = 1 << 20):
+    """Yield an uncompressed zip of root_dir chunk by chunk."""
+    sink = _ZipStreamBuffer()
+    # LoRA safetensors barely compress, so ZIP_STORED skips DEFLATE entirely.
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for dirpath, _, filenames in os.walk(root_dir):
+            for filename in filenames:
+                file_path = os.path.join(dirpath, filename)
+                zinfo = zipfile.ZipInfo.from_file(file_path, os.path.relpath(file_path, root_dir))
+                with open(file_path, "rb") as src, zf.open(zinfo, 'w') as dest:
+                    while chunk := src.read(chunk_size):
+                        dest.write(chunk)
+                        yield sink.drain()
+    # Flush the local header/data descriptor of the last entry and the central directory
+    yield sink.drain()
+
 @app.get("/models/download/{model_name}")
 def download_lora_model(model_name: str):
+    if not _is_safe_name(model_name):
+        return JSONResponse(status_code=400, content={"message": "Invalid model name."})
     models_dir = "lora_models"
     model_path = os.path.join(models_dir, model_name)
 
@@ -200,13 +410,17 @@ def download_lora_model(model_name: str):
             print(f"Error deleting empty directory {model_path}: {e}")
         return JSONResponse(status_code=404, content={"message": "Model is empty and has been deleted. Please refresh the model list."})
 
-    # Create a zip archive of the model directory
-    shutil.make_archive(model_name, 'zip', model_path)
-
-    return FileResponse(f"{model_name}.zip", media_type='application/zip', filename=f"{model_name}.zip")
+    # Stream the zip archive as it is built instead of writing it to disk first
+    return StreamingResponse(
+        _iter_zip_directory(model_path),
+        media_type='application/zip',
+        headers={"Content-Disposition": f"attachment; filename*=utf-8''{quote(model_name)}.zip"},
+    )
 
 @app.delete("/models/delete/{model_name}")
 def delete_lora_model(model_name: str):
+    if not _is_safe_name(model_name):
+        return {"status": "error", "message": "Invalid model name."}
     models_dir = "lora_models"
     model_path = os.path.join(models_dir, model_name)
 
@@ -225,24 +439,87 @@ def get_generated_image(image_id: str):
     image_data = generated_images.get(image_id)
     if not image_data:
         return {"status": "error", "message": "Image not found."}
-    
-    # Clean up the image from memory after it's been fetched once
-    # del generated_images[image_id]
-    
-    return StreamingResponse(io.BytesIO(image_data), media_type="image/png")
+
+    # The PNG is already fully in memory; send it as one body with a Content-Length
+    # rather than re-chunking it through a BytesIO stream.
+    return Response(content=image_data, media_type="image/png")
 
 @app.get("/check-mps")
 def check_mps():
     # ... (omitting unchanged endpoint for brevity)
-    if torch.backends.mps.is_available():
+    if DEVICE == "mps":
         return {"status": "success", "message": "MPS is available and ready for GPU acceleration on your Mac."}
     else:
-        return {"status": "error", "message": "MPS is not available. The server will use CPU."}
+        return {"status": "error", "message": f"MPS is not available. The server will use {DEVICE.upper()}."}
 
 @app.get("/train/status")
 def get_training_status():
     """Endpoint for the frontend to poll for training status."""
-    return training_status
+    _reap_training_process()
+    return training_status.copy()
+
+def _prepare_training_dir(image_dir: str) -> Optional[str]:
+    """Start from an empty directory for the uploaded training images.
+
+    The previous directory is only renamed out of the way (one syscall); its path
+    is returned so it can be removed after the response has been sent.
+    """
+    old_dir = None
+    if os.path.exists(image_dir):
+        old_dir = f"{image_dir}.old-{uuid.uuid4().hex}"
+        os.rename(image_dir, old_dir)
+    os.makedirs(image_dir)
+    return old_dir
+
+# Handle of the training process started by this worker, if any
+training_process = None
+# Serialises /train from the in-progress check until the new process is started
+_training_lock = asyncio.Lock()
+# Status polls run in the threadpool, so reaping can happen on several threads at once
+_reap_lock = threading.Lock()
+
+def _reap_training_process():
+    """Collect a finished training process and flag it if it died without reporting back."""
+    global training_process
+    with _reap_lock:
+        proc = training_process
+        if proc is None:
+            # A Redis status survives restarts, so a job whose worker crashed would
+            # otherwise stay "training" forever; its owner lease tells us it's gone.
+            if isinstance(training_status, RedisStatus) \
+                    and training_status["status"] in ["training", "initializing", "loading_models"] \
+                    and not training_status.has_live_owner():
+                training_status.update({
+                    "status": "failed",
+                    "message": "Training was interrupted (the server running it stopped).",
+                })
+            return
+        if proc.is_alive():
+            return
+        if training_status["status"] not in ["completed", "failed"]:
+            training_status.update({
+                "status": "failed",
+                "message": f"Training process exited unexpectedly (exit code {proc.exitcode}).",
+            })
+        training_process = None
+
+_UNSAFE_FILENAME_RE = re.compile(r'[^\w.-]')
+
+def _safe_upload_filename(filename: Optional[str], index: int) -> str:
+    """Flatten a client-supplied filename into a plain name inside the upload dir.
+
+    Path separators (either style), null bytes and other specials become '_' and
+    leading dots are dropped, so neither '..' nor hidden files survive. The upload
+    index is prefixed so names that flatten to the same string don't collide.
+    """
+    name = _UNSAFE_FILENAME_RE.sub('_', filename or "")[-128:].lstrip('.')
+    return f"{index}_{name}" if name else f"img_{index}.bin"
+
+async def _save_upload(upload: UploadFile, file_path: str, chunk_size: int = 1 << 20):
+    """Copy an uploaded file to disk without blocking the event loop."""
+    async with aiofiles.open(file_path, "wb") as buffer:
+        while chunk := await upload.read(chunk_size):
+            await buffer.write(chunk)
 
 @app.post("/train")
 async def trigger_training(
@@ -255,44 +532,61 @@ async def trigger_training(
     resolution: int = Form(...),
     trainBatchSize: int = Form(...),
 ):
-    if training_status["status"] == "training":
-        return {"status": "error", "message": "A training job is already in progress."}
-
-    image_dir = "temp_training_images"
-    if os.path.exists(image_dir):
-        shutil.rmtree(image_dir)
-    os.makedirs(image_dir)
-
-    for image in images:
-        filename = os.path.basename(str(image.filename))
-        file_path = os.path.join(image_dir, filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
-    
-    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    safe_prompt = instancePrompt.replace(' ', '_').replace('\\','').replace('/','')
-    output_dir = f"lora_models/{safe_prompt}-{timestamp}"
-
-    training_config = TrainingConfig(
-        pretrained_model_name_or_path=baseModel,
-        instance_data_dir=image_dir,
-        output_dir=output_dir,
-        instance_prompt=instancePrompt,
-        max_train_steps=steps,
-        learning_rate=learningRate,
-        resolution=resolution,
-        train_batch_size=trainBatchSize,
-        # Using some sensible defaults for other params
-        gradient_accumulation_steps=1,
-        gradient_checkpointing=True, # Good for memory saving
-        lr_scheduler="constant",
-        report_to="tensorboard", # Will create local logs
-         mixed_precision="no", # Required for MPS
-    )
+    global training_process
+    # The uploads below await, so without the lock a second submit could pass the
+    # check before this one has started its process
+    async with _training_lock:
+        _reap_training_process()
+        # The process check covers the window before a fresh child has reported back
+        # and any status write a dying child makes after being marked failed
+        proc = training_process
+        if (proc is not None and proc.is_alive()) \
+                or training_status["status"] in ["training", "initializing", "loading_models"]:
+            return {"status": "error", "message": "A training job is already in progress."}
+
+        image_dir = "temp_training_images"
+        old_image_dir = _prepare_training_dir(image_dir)
+        if old_image_dir:
+            background_tasks.add_task(shutil.rmtree, old_image_dir, ignore_errors=True)
+
+        await asyncio.gather(*[
+            _save_upload(image, os.path.join(image_dir, _safe_upload_filename(image.filename, i)))
+            for i, image in enumerate(images)
+        ])
+
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        safe_prompt = _UNSAFE_NAME_RE.sub('_', instancePrompt)[:64]
+        output_dir = f"lora_models/{safe_prompt}-{timestamp}"
+
+        training_config = TrainingConfig(
+            pretrained_model_name_or_path=baseModel,
+            instance_data_dir=image_dir,
+            output_dir=output_dir,
+            instance_prompt=instancePrompt,
+            max_train_steps=steps,
+            learning_rate=learningRate,
+            resolution=resolution,
+            train_batch_size=trainBatchSize,
+            # Using some sensible defaults for other params
+            gradient_accumulation_steps=1,
+            gradient_checkpointing=True, # Good for memory saving
+            lr_scheduler="constant",
+            report_to="tensorboard", # Will create local logs
+            # mixed_precision defaults to bf16/fp16 on capable GPUs and "no" on MPS
+        )
 
-    # Reset status and add the training function to background tasks
-    training_status.update({"status": "initializing", "progress": 0, "message": "Request received...", "should_stop": False})
-    background_tasks.add_task(run_lora_training, config=training_config, status_updater=training_status)
+        # Reset status and run training in its own process so it owns the GPU context
+        # and its GIL, keeping the API responsive (and alive if training OOMs).
+        training_process = multiprocessing.get_context("spawn").Process(
+            target=run_lora_training,
+            kwargs={"config": training_config, "status_updater": training_status},
+        )
+        if isinstance(training_status, RedisStatus):
+            # Claim the job before marking it active so other workers never see it ownerless
+            process = training_process
+            training_status.hold_lease(lambda: process.exitcode is None)
+        training_status.update({"status": "initializing", "progress": 0, "message": "Request received...", "should_stop": False})
+        training_process.start()
 
     return {
         "status": "success",
@@ -0,0 +1,176 @@
+"""Shared state for training/inference status and generated images.
+
+By default everything lives in process memory, which is all the local
+single-worker setup needs; status that a training process must write is held
+by a multiprocessing manager instead of a plain dict. Setting the REDIS_URL environment variable moves
+the state into Redis so several Uvicorn workers can serve status polls,
+termination requests and image fetches.
+"""
+
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Callable, Optional
+
+REDIS_URL = os.environ.get("REDIS_URL")
+IMAGE_TTL_SECONDS = 3600
+MAX_CACHED_IMAGES = 64
+LEASE_TTL_SECONDS = 30
+
+_redis_client = None
+_manager = None
+
+def get_redis():
+    """Return the shared Redis client, creating it on first use."""
+    global _redis_client
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.Redis.from_url(REDIS_URL)
+    return _redis_client
+
+def get_manager():
+    """Return the shared multiprocessing manager, starting it on first use."""
+    global _manager
+    if _manager is None:
+        _manager = multiprocessing.get_context("spawn").Manager()
+    return _manager
+
+class RedisStatus(MutableMapping):
+    """Dict-like view over a Redis hash. Values are stored JSON-encoded.
+
+    The training and inference code updates its status from worker threads, so
+    this deliberately uses the synchronous client.
+    """
+
+    def __init__(self, client, key: str, defaults: Optional[dict] = None):
+        self._client = client
+        self._key = key
+        if defaults:
+            # Only fill in missing fields so a restarting worker doesn't clobber
+            # the status of a job another worker is running.
+            pipe = client.pipeline()
+            for field, value in defaults.items():
+                pipe.hsetnx(key, field, json.dumps(value))
+            pipe.execute()
+
+    def __reduce__(self):
+        # Clients hold sockets and locks; another process reconnects by key instead
+        return (_attach_redis_status, (self._key,))
+
+    def __getitem__(self, field):
+        value = self._client.hget(self._key, field)
+        if value is None:
+            raise KeyError(field)
+        return json.loads(value)
+
+    def __setitem__(self, field, value):
+        self._client.hset(self._key, field, json.dumps(value))
+
+    def __delitem__(self, field):
+        if not self._client.hdel(self._key, field):
+            raise KeyError(field)
+
+    def __iter__(self):
+        return iter(self.copy())
+
+    def __len__(self):
+        return self._client.hlen(self._key)
+
+    def update(self, other=(), **kwargs):
+        # Write all fields in a single HSET instead of one round trip per key
+        mapping = dict(other, **kwargs)
+        if mapping:
+            self._client.hset(self._key, mapping={field: json.dumps(value) for field, value in mapping.items()})
+
+    def copy(self) -> dict:
+        return {field.decode(): json.loads(value) for field, value in self._client.hgetall(self._key).items()}
+
+    def hold_lease(self, alive: Callable[[], bool], ttl: int = LEASE_TTL_SECONDS):
+        """Mark this process as the owner of the job the status describes.
+
+        The "<key>:owner" key is written immediately and then refreshed from a
+        daemon thread for as long as `alive()` holds, so it expires `ttl` seconds
+        after the job or the process holding it goes away.
+        """
+        owner_key = f"{self._key}:owner"
+        owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._client.set(owner_key, owner, ex=ttl)
+
+        def refresh():
+            while alive():
+                self._client.set(owner_key, owner, ex=ttl)
+                time.sleep(ttl / 3)
+
+        threading.Thread(target=refresh, name=f"lease:{self._key}", daemon=True).start()
+
+    def has_live_owner(self) -> bool:
+        return bool(self._client.exists(f"{self._key}:owner"))
+
+def _attach_redis_status(key: str) -> RedisStatus:
+    return RedisStatus(get_redis(), key)
+
+class RedisImageStore:
+    """Generated PNG bytes keyed by image id, expiring after `ttl` seconds."""
+
+    def __init__(self, client, ttl: int = IMAGE_TTL_SECONDS):
+        self._client = client
+        self._ttl = ttl
+
+    def __setitem__(self, image_id: str, data: bytes):
+        self._client.set(f"image:{image_id}", data, ex=self._ttl)
+
+    def get(self, image_id: str, default=None):
+        data = self._client.get(f"image:{image_id}")
+        return default if data is None else data
+
+class MemoryImageStore:
+    """Generated PNG bytes kept in process memory, bounded by LRU eviction and a TTL."""
+
+    def __init__(self, maxsize: int = MAX_CACHED_IMAGES, ttl: int = IMAGE_TTL_SECONDS):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._images = OrderedDict() # image_id -> (expires_at, data), least recently used first
+        # Written from the inference thread, read from threadpool request handlers
+        self._lock = threading.Lock()
+
+    def __setitem__(self, image_id: str, data: bytes):
+        with self._lock:
+            self._images[image_id] = (time.monotonic() + self._ttl, data)
+            self._images.move_to_end(image_id)
+            while len(self._images) > self._maxsize:
+                self._images.popitem(last=False)
+
+    def get(self, image_id: str, default=None):
+        with self._lock:
+            entry = self._images.get(image_id)
+            if entry is None:
+                return default
+            expires_at, data = entry
+            if expires_at < time.monotonic():
+                del self._images[image_id]
+                return default
+            self._images.move_to_end(image_id)
+            return data
+
+def create_status_store(key: str, defaults: dict, shared: bool = False):
+    """Return a status mapping, backed by Redis when REDIS_URL is set.
+
+    With `shared`, the in-memory fallback is a manager dict so that a child
+    process can update it.
+    """
+    if REDIS_URL:
+        return RedisStatus(get_redis(), key, defaults)
+    if shared:
+        return get_manager().dict(defaults)
+    return dict(defaults)
+
+def create_image_store():
+    """Return the generated-image store, backed by Redis when REDIS_URL is set."""
+    if REDIS_URL:
+        return RedisImageStore(get_redis())
+    return MemoryImageStore()
@@ -5,17 +5,19 @@
 # Key changes:
 # - Replaced argparse with a TrainingConfig dataclass.
 # - The main logic is wrapped in a `start_training` function.
-# - Added a `status_updater` dictionary argument to report progress back to the main app.
+# - Added a `status_updater` mapping argument (a dict, or a Redis-backed view) to report progress back to the main app.
 # - Removed/disabled features not relevant for local, single-GPU (MPS) training.
 
 import os
 import gc
 import math
+import functools
 import shutil
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import MutableMapping, Optional
 
 import torch
 import torch.nn.functional as F
@@ -38,9 +40,12 @@ from diffusers import (
     UNet2DConditionModel,
 )
 from diffusers.loaders import StableDiffusionLoraLoaderMixin
+from diffusers.models.attention_processor import AttnProcessor2_0
+from diffusers.models.autoencoders.vae import DiagonalGaussianDistribution
 from diffusers.optimization import get_scheduler
-from diffusers.training_utils import free_memory
+from diffusers.training_utils import cast_training_params, free_memory
 from diffusers.utils import check_min_version, convert_state_dict_to_diffusers, convert_unet_state_dict_to_peft
+from diffusers.utils.import_utils import is_xformers_available
 from peft import LoraConfig
 from peft.utils import get_peft_model_state_dict, set_peft_model_state_dict
 
@@ -48,6 +53,16 @@ check_min_version("0.36.0.dev0")
 
 logger = get_logger(__name__)
 
+def default_mixed_precision() -> str:
+    """bf16 on Ampere+ GPUs, fp16 on Volta/Turing, full precision elsewhere (MPS, CPU)."""
+    if torch.cuda.is_available():
+        major, _ = torch.cuda.get_device_capability()
+        if major >= 8:
+            return "bf16"
+        if major >= 7:
+            return "fp16"
+    return "no"
+
 @dataclass
 class TrainingConfig:
     pretrained_model_name_or_path: str
@@ -69,19 +84,26 @@ class TrainingConfig:
     scale_lr: bool = False
     lr_scheduler: str = "constant"
     lr_warmup_steps: int = 0
-    dataloader_num_workers: int = 0
+    dataloader_num_workers: int = min(4, os.cpu_count() or 1)
+    use_8bit_adam: bool = False
+    use_fused_adam: bool = True
     adam_beta1: float = 0.9
     adam_beta2: float = 0.999
     adam_weight_decay: float = 1e-2
     adam_epsilon: float = 1e-08
     max_grad_norm: float = 1.0
     logging_dir: str = "logs"
+    logging_steps: int = 10
     report_to: str = "tensorboard"
-    mixed_precision: str = "no"
+    mixed_precision: str = field(default_factory=default_mixed_precision)
     rank: int = 4
     lora_dropout: float = 0.0
     image_interpolation_mode: str = "lanczos"
     tokenizer_max_length: Optional[int] = None
+    # Encode each instance image with the frozen VAE once instead of every step.
+    # Each image's random crop is then fixed for the whole run.
+    cache_latents: bool = True
+    use_memory_efficient_attention: bool = True
 
 class DreamBoothDataset(Dataset):
     # ... (omitting unchanged class for brevity)
@@ -104,41 +126,56 @@ class DreamBoothDataset(Dataset):
         if not self.instance_data_root.exists():
             raise ValueError("Instance images root doesn't exist.")
 
-        self.instance_images_path = [img for img in Path(instance_data_root).iterdir() if img.is_file()]
+        with os.scandir(instance_data_root) as it:
+            self.instance_images_path = [Path(entry.path) for entry in it if entry.is_file()]
         self.num_instance_images = len(self.instance_images_path)
         self.instance_prompt = instance_prompt
         self._length = self.num_instance_images
+        # The instance prompt is a single constant string; tokenize it once
+        text_inputs = tokenize_prompt(tokenizer, instance_prompt, tokenizer_max_length=tokenizer_max_length)
+        self._input_ids = text_inputs.input_ids
+        self._attention_mask = text_inputs.attention_mask
+
+        # VAE posterior parameters per image, filled in by compute_vae_latent_params
+        self.cached_latent_params = None
 
         interpolation = getattr(transforms.InterpolationMode, image_interpolation_mode.upper(), None)
         if interpolation is None:
             raise ValueError(f"Unsupported interpolation mode {image_interpolation_mode}.")
 
-        self.image_transforms = transforms.Compose(
-            [
-                transforms.Resize(size, interpolation=interpolation),
-                transforms.CenterCrop(size) if center_crop else transforms.RandomCrop(size),
-                transforms.ToTensor(),
-                transforms.Normalize([0.5], [0.5]),
-            ]
-        )
+        self.image_resize = transforms.Resize(size, interpolation=interpolation)
+        self.image_crop = transforms.CenterCrop(size) if center_crop else transforms.RandomCrop(size)
 
-    def __len__(self):
-        return self._length
+        # The handful of instance images is reused for thousands of steps, so decode
+        # and resize each once up front; __getitem__ only crops and normalizes.
+        # PIL releases the GIL while decoding, so threads overlap I/O and decode.
+        with ThreadPoolExecutor(max_workers=max(1, min(8, self.num_instance_images))) as pool:
+            self.cached_images = list(pool.map(self._load_image, self.instance_images_path))
 
-    def __getitem__(self, index):
-        example = {}
-        instance_image = Image.open(self.instance_images_path[index % self.num_instance_images])
+    def _load_image(self, path):
+        instance_image = Image.open(path)
+        # Let libjpeg decode at a reduced scale that still leaves headroom for Resize
+        instance_image.draft("RGB", (self.size * 2, self.size * 2))
         instance_image = exif_transpose(instance_image)
 
         if not instance_image.mode == "RGB":
             instance_image = instance_image.convert("RGB")
-        example["instance_images"] = self.image_transforms(instance_image)
+        return transforms.functional.pil_to_tensor(self.image_resize(instance_image))
 
-        text_inputs = tokenize_prompt(
-            self.tokenizer, self.instance_prompt, tokenizer_max_length=self.tokenizer_max_length
-        )
-        example["instance_prompt_ids"] = text_inputs.input_ids
-        example["instance_attention_mask"] = text_inputs.attention_mask
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        example = {}
+        if self.cached_latent_params is not None:
+            example["instance_latent_params"] = self.cached_latent_params[index % self.num_instance_images]
+        else:
+            instance_image = self.image_crop(self.cached_images[index % self.num_instance_images])
+            # uint8 [0, 255] -> float [-1, 1], same as ToTensor() + Normalize([0.5], [0.5])
+            example["instance_images"] = instance_image.float().div_(127.5).sub_(1.0)
+
+        example["instance_prompt_ids"] = self._input_ids
+        example["instance_attention_mask"] = self._attention_mask
 
         return example
 
@@ -162,26 +199,61 @@ def collate_fn(examples, with_prior_preservation=False):
     # ... (omitting unchanged function for brevity)
     has_attention_mask = "instance_attention_mask" in examples[0]
 
-    input_ids = [example["instance_prompt_ids"] for example in examples]
-    pixel_values = [example["instance_images"] for example in examples]
-
-    if has_attention_mask:
-        attention_mask = [example["instance_attention_mask"] for example in examples]
-
-    pixel_values = torch.stack(pixel_values)
-    pixel_values = pixel_values.to(memory_format=torch.contiguous_format).float()
-
-    input_ids = torch.cat(input_ids, dim=0)
+    # Every example carries the dataset's single (1, max_length) prompt tensor,
+    # so broadcast it to the batch as a view instead of concatenating copies.
+    bsz = len(examples)
+    input_ids = examples[0]["instance_prompt_ids"].expand(bsz, -1)
 
     batch = {
         "input_ids": input_ids,
-        "pixel_values": pixel_values,
     }
+    if "instance_latent_params" in examples[0]:
+        batch["latent_params"] = torch.stack([example["instance_latent_params"] for example in examples])
+    else:
+        # The dataset already yields contiguous float32 tensors, so a single stack
+        # straight into the batch buffer is the only allocation needed.
+        pixel_values = [example["instance_images"] for example in examples]
+        batch["pixel_values"] = torch.stack(pixel_values)
     if has_attention_mask:
-        batch["attention_mask"] = torch.cat(attention_mask, dim=0)
+        batch["attention_mask"] = examples[0]["instance_attention_mask"].expand(bsz, -1)
 
     return batch
 
+def sample_timesteps(num_train_timesteps, bsz, device):
+    """Stratified timestep sampling: split [0, T) into bsz buckets of width T / bsz and draw one per bucket.
+
+    Covers the noise schedule more evenly than independent uniform draws, which
+    lowers gradient variance; with bsz=1 it is plain uniform sampling. The bucket
+    edges are fractional so every timestep stays reachable when bsz doesn't divide T.
+    """
+    positions = torch.arange(bsz, device=device) + torch.rand(bsz, device=device)
+    # Clamp guards against float rounding landing exactly on T
+    return (positions * (num_train_timesteps / bsz)).long().clamp_(max=num_train_timesteps - 1)
+
+def noise_and_add(model_input, noise, timesteps, sqrt_alphas_cumprod, sqrt_one_minus_alphas_cumprod):
+    """Apply the forward diffusion q(x_t | x_0); same result as DDPMScheduler.add_noise.
+
+    Written as one function so torch.compile can gather the per-timestep
+    coefficients and compute the weighted sum in a single kernel.
+    """
+    sqrt_alpha_prod = sqrt_alphas_cumprod[timesteps].view(-1, 1, 1, 1)
+    sqrt_one_minus_alpha_prod = sqrt_one_minus_alphas_cumprod[timesteps].view(-1, 1, 1, 1)
+    return sqrt_alpha_prod * model_input + sqrt_one_minus_alpha_prod * noise
+
+def mse_loss(model_pred, target):
+    """Mean squared error written out so torch.compile fuses sub, square and mean into one kernel."""
+    return (model_pred - target).square().mean()
+
+@torch.no_grad()
+def compute_vae_latent_params(dataset, vae, device, dtype, pin_memory=False):
+    """Encode every instance image once and return its VAE posterior parameters (mean and logvar)."""
+    latent_params = []
+    for index in range(dataset.num_instance_images):
+        pixel_values = dataset[index]["instance_images"].unsqueeze(0).to(device, dtype=dtype)
+        params = vae.encode(pixel_values).latent_dist.parameters.squeeze(0).cpu()
+        latent_params.append(params.pin_memory() if pin_memory else params)
+    return latent_params
+
 def import_model_class_from_model_name_or_path(pretrained_model_name_or_path: str, revision: str):
     # ... (omitting unchanged function for brevity)
     text_encoder_config = PretrainedConfig.from_pretrained(
@@ -195,7 +267,7 @@ def import_model_class_from_model_name_or_path(pretrained_model_name_or_path: st
     else:
         raise ValueError(f"{model_class} is not supported.")
 
-def start_training(config: TrainingConfig, status_updater: Optional[dict] = None):
+def start_training(config: TrainingConfig, status_updater: Optional[MutableMapping] = None):
     try:
         if status_updater:
             status_updater.update({"status": "initializing", "progress": 0, "message": "Initializing training..."})
@@ -211,6 +283,15 @@ def start_training(config: TrainingConfig, status_updater: Optional[dict] = None
         if accelerator.device.type == "mps":
             accelerator.native_amp = False
 
+        # Shapes are fixed across steps, so let cuDNN autotune conv algorithms and
+        # allow TF32 tensor-core matmuls/convs on Ampere+.
+        use_channels_last = accelerator.device.type == "cuda"
+        if use_channels_last:
+            torch.backends.cudnn.benchmark = True
+            torch.backends.cuda.matmul.allow_tf32 = True
+            torch.backends.cudnn.allow_tf32 = True
+            torch.set_float32_matmul_precision("high")
+
         logging.basicConfig(
             format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
             datefmt="%m/%d/%Y %H:%M:%S",
@@ -257,6 +338,15 @@ def start_training(config: TrainingConfig, status_updater: Optional[dict] = None
             config.pretrained_model_name_or_path, subfolder="unet", revision=config.revision, variant=config.variant
         )
 
+        if config.use_memory_efficient_attention:
+            # Fused attention never materializes the (HW x HW) attention map. Prefer
+            # torch 2 SDPA (FlashAttention when available, and torch.compile-friendly).
+            # Set before add_adapter so LoRA wraps the projections this processor uses.
+            if hasattr(F, "scaled_dot_product_attention"):
+                unet.set_attn_processor(AttnProcessor2_0())
+            elif is_xformers_available():
+                unet.enable_xformers_memory_efficient_attention()
+
         vae.requires_grad_(False)
         text_encoder.requires_grad_(False)
         unet.requires_grad_(False)
@@ -267,9 +357,29 @@ def start_training(config: TrainingConfig, status_updater: Optional[dict] = None
         elif accelerator.mixed_precision == "bf16":
             weight_dtype = torch.bfloat16
 
+        # add_noise indexes alphas_cumprod with on-device timesteps; keep it on the device too
+        noise_scheduler.alphas_cumprod = noise_scheduler.alphas_cumprod.to(accelerator.device)
+        sqrt_alphas_cumprod = noise_scheduler.alphas_cumprod.sqrt().to(dtype=weight_dtype)
+        sqrt_one_minus_alphas_cumprod = (1 - noise_scheduler.alphas_cumprod).sqrt().to(dtype=weight_dtype)
         unet.to(accelerator.device, dtype=weight_dtype)
         vae.to(accelerator.device, dtype=weight_dtype)
         text_encoder.to(accelerator.device, dtype=weight_dtype)
+        if use_channels_last:
+            # NHWC is the layout tensor-core convolutions actually want
+            unet.to(memory_format=torch.channels_last)
+            vae.to(memory_format=torch.channels_last)
+
+        # The instance prompt is constant and the text encoder frozen, so its output
+        # is the same every step: encode it once and free the encoder.
+        prompt_embeds = None
+        if not config.train_text_encoder:
+            text_inputs = tokenize_prompt(tokenizer, config.instance_prompt, tokenizer_max_length=config.tokenizer_max_length)
+            with torch.no_grad():
+                prompt_embeds = encode_prompt(text_encoder, text_inputs.input_ids, text_inputs.attention_mask)
+            prompt_embeds = prompt_embeds.to(weight_dtype)
+            text_encoder.to("cpu")
+            text_encoder = None
+            free_memory()
 
         if config.gradient_checkpointing:
             unet.enable_gradient_checkpointing()
@@ -282,14 +392,34 @@ def start_training(config: TrainingConfig, status_updater: Optional[dict] = None
             target_modules=["to_k", "to_q", "to_v", "to_out.0"],
         )
         unet.add_adapter(unet_lora_config)
+        if accelerator.mixed_precision == "fp16":
+            # The grad scaler can't unscale fp16 grads, so keep the trainable LoRA weights in fp32
+            cast_training_params(unet, dtype=torch.float32)
 
         params_to_optimize = list(filter(lambda p: p.requires_grad, unet.parameters()))
-        optimizer = torch.optim.AdamW(
+        # LoRA has many small parameter tensors, so a per-tensor optimizer loop is
+        # dominated by launch overhead; prefer a single fused/8-bit update kernel.
+        optimizer_kwargs = {}
+        if config.use_8bit_adam:
+            try:
+                import bitsandbytes as bnb
+            except ImportError:
+                raise ImportError(
+                    "To use 8-bit Adam, please install the bitsandbytes library: `pip install bitsandbytes`."
+                )
+            optimizer_class = bnb.optim.AdamW8bit
+        else:
+            optimizer_class = torch.optim.AdamW
+            if config.use_fused_adam and accelerator.device.type == "cuda":
+                optimizer_kwargs["fused"] = True
+
+        optimizer = optimizer_class(
             params_to_optimize,
             lr=config.learning_rate,
             betas=(config.adam_beta1, config.adam_beta2),
             weight_decay=config.adam_weight_decay,
             eps=config.adam_epsilon,
+            **optimizer_kwargs,
         )
 
         train_dataset = DreamBoothDataset(
@@ -302,12 +432,28 @@ def start_training(config: TrainingConfig, status_updater: Optional[dict] = None
             image_interpolation_mode=config.image_interpolation_mode,
         )
 
+        vae_scaling_factor = vae.config.scaling_factor
+        if config.cache_latents:
+            train_dataset.cached_latent_params = compute_vae_latent_params(
+                train_dataset, vae, accelerator.device, weight_dtype, pin_memory=accelerator.device.type == "cuda"
+            )
+            # The VAE is not needed again during training; release its memory
+            vae.to("cpu")
+            vae = None
+            free_memory()
+
+        # Cached latents are just indexed tensors, so worker processes would only add overhead
+        num_workers = 0 if train_dataset.cached_latent_params is not None else config.dataloader_num_workers
         train_dataloader = torch.utils.data.DataLoader(
             train_dataset,
             batch_size=config.train_batch_size,
             shuffle=True,
-            collate_fn=lambda examples: collate_fn(examples, False),
-            num_workers=config.dataloader_num_workers,
+            # A partial (unlike a lambda) can be pickled into spawned worker processes
+            collate_fn=functools.partial(collate_fn, with_prior_preservation=False),
+            num_workers=num_workers,
+            pin_memory=accelerator.device.type == "cuda",
+            persistent_workers=num_workers > 0,
+            prefetch_factor=2 if num_workers > 0 else None,
         )
         
         num_train_epochs = math.ceil(config.max_train_steps / (len(train_dataloader) / config.gradient_accumulation_steps))
@@ -319,9 +465,32 @@ def start_training(config: TrainingConfig, status_updater: Optional[dict] = None
             num_training_steps=config.max_train_steps * config.gradient_accumulation_steps,
         )
 
-        unet, optimizer, train_dataloader, lr_scheduler = accelerator.prepare(
-            unet, optimizer, train_dataloader, lr_scheduler
-        )
+        # Eager F.mse_loss is already a single ATen op; on CUDA compile our own so
+        # the loss is fused into one pass over the prediction and target. The same
+        # goes for mixing the noise into the latents.
+        loss_fn = F.mse_loss
+        noise_fn = noise_and_add
+        if accelerator.device.type == "cuda" and hasattr(torch, "compile"):
+            loss_fn = torch.compile(mse_loss)
+            noise_fn = torch.compile(noise_and_add)
+
+        # Every step runs the UNet with identical shapes and dtype, so compilation cost
+        # amortises over max_train_steps. fullgraph=False because the LoRA-adapted
+        # attention has Python control flow.
+        if accelerator.device.type == "cuda" and hasattr(torch, "compile"):
+            unet = torch.compile(unet, mode="reduce-overhead", fullgraph=False, dynamic=False)
+
+        # Single device only, so the dataloader isn't prepared: Accelerate's wrapper
+        # would only add per-batch overhead, and batches are placed on the device below.
+        unet, optimizer, lr_scheduler = accelerator.prepare(unet, optimizer, lr_scheduler)
+        # prepare() may wrap the model; take the trainable parameters from what it returned
+        params_to_optimize = [p for p in unet.parameters() if p.requires_grad]
+        # foreach kernels for gradient clipping are only guaranteed on CUDA; elsewhere let torch pick
+        use_foreach = True if accelerator.device.type == "cuda" else None
+
+        # Hoist config lookups out of the per-step loop
+        num_train_timesteps = noise_scheduler.config.num_train_timesteps
+        prediction_type = noise_scheduler.config.prediction_type
 
         logger.info("***** Running training *****")
         # ... (logging info)
@@ -331,6 +500,26 @@ def start_training(config: TrainingConfig, status_updater: Optional[dict] = None
 
         global_step = 0
         terminated = False # Flag to indicate if training was stopped early
+        # Losses are summed on the device and only read back every logging_steps
+        loss_accum = torch.zeros((), device=accelerator.device)
+        loss_count = 0
+
+        # Noise comes from a dedicated device generator into a buffer reused across
+        # steps, rather than a fresh allocation from the global generator each step.
+        noise_generator = torch.Generator(device=accelerator.device)
+        if config.seed is not None:
+            # set_seed already gave the global generator config.seed; reusing it here
+            # would make the VAE latent sample on the first step equal the noise
+            noise_generator.manual_seed(config.seed + 1)
+        else:
+            noise_generator.seed()
+        noise_buf = None
+
+        # Only copy what the step reads; the prompt tensors go unused once the
+        # embeddings are cached
+        device_keys = {"latent_params", "pixel_values"}
+        if prompt_embeds is None:
+            device_keys |= {"input_ids", "attention_mask"}
 
         progress_bar = tqdm(range(global_step, config.max_train_steps), disable=not accelerator.is_local_main_process)
         progress_bar.set_description("Steps")
@@ -346,60 +535,86 @@ def start_training(config: TrainingConfig, status_updater: Optional[dict] = None
                         status_updater.update({"status": "failed", "progress": status_updater.get("progress", 0), "message": "Training was cancelled by the user."})
                     break # Exit the inner loop
 
+                batch = {k: v.to(accelerator.device, non_blocking=True) for k, v in batch.items() if k in device_keys}
+
                 with accelerator.accumulate(unet):
                     # ... (core training step logic)
-                    pixel_values = batch["pixel_values"].to(dtype=weight_dtype)
-                    model_input = vae.encode(pixel_values).latent_dist.sample()
-                    model_input = model_input * vae.config.scaling_factor
+                    if "latent_params" in batch:
+                        latent_params = batch["latent_params"].to(dtype=weight_dtype)
+                        model_input = DiagonalGaussianDistribution(latent_params).sample()
+                    else:
+                        pixel_values = batch["pixel_values"].to(dtype=weight_dtype)
+                        if use_channels_last:
+                            pixel_values = pixel_values.contiguous(memory_format=torch.channels_last)
+                        # The VAE is frozen; don't record its activations for autograd
+                        with torch.no_grad():
+                            model_input = vae.encode(pixel_values).latent_dist.sample()
+                    model_input = model_input * vae_scaling_factor
 
-                    noise = torch.randn_like(model_input)
                     bsz = model_input.shape[0]
-                    timesteps = torch.randint(
-                        0, noise_scheduler.config.num_train_timesteps, (bsz,), device=model_input.device
-                    )
-                    timesteps = timesteps.long()
+                    timesteps = sample_timesteps(num_train_timesteps, bsz, model_input.device)
 
-                    noisy_model_input = noise_scheduler.add_noise(model_input, noise, timesteps)
-                    
-                    encoder_hidden_states = encode_prompt(
-                        text_encoder,
-                        batch["input_ids"],
-                        batch["attention_mask"],
+                    if noise_buf is None or noise_buf.shape != model_input.shape:
+                        noise_buf = torch.empty_like(model_input)
+                    noise = noise_buf.normal_(generator=noise_generator)
+                    noisy_model_input = noise_fn(
+                        model_input, noise, timesteps, sqrt_alphas_cumprod, sqrt_one_minus_alphas_cumprod
                     )
+                    
+                    if prompt_embeds is not None:
+                        encoder_hidden_states = prompt_embeds.expand(bsz, -1, -1)
+                    else:
+                        with torch.no_grad():
+                            encoder_hidden_states = encode_prompt(
+                                text_encoder,
+                                batch["input_ids"],
+                                batch["attention_mask"],
+                            )
 
                     model_pred = unet(noisy_model_input, timesteps, encoder_hidden_states, return_dict=False)[0]
 
-                    if noise_scheduler.config.prediction_type == "epsilon":
+                    if prediction_type == "epsilon":
                         target = noise
-                    elif noise_scheduler.config.prediction_type == "v_prediction":
+                    elif prediction_type == "v_prediction":
                         target = noise_scheduler.get_velocity(model_input, noise, timesteps)
                     else:
-                        raise ValueError(f"Unknown prediction type {noise_scheduler.config.prediction_type}")
+                        raise ValueError(f"Unknown prediction type {prediction_type}")
 
-                    loss = F.mse_loss(model_pred.float(), target.float(), reduction="mean")
+                    loss = loss_fn(model_pred, target.to(model_pred.dtype))
                     
                     accelerator.backward(loss)
                     if accelerator.sync_gradients:
-                        accelerator.clip_grad_norm_(params_to_optimize, config.max_grad_norm)
+                        # Unscale (a no-op unless fp16) then clip all LoRA grads with the
+                        # multi-tensor foreach kernels instead of a per-tensor loop.
+                        accelerator.unscale_gradients()
+                        torch.nn.utils.clip_grad_norm_(params_to_optimize, config.max_grad_norm, foreach=use_foreach)
                     
                     optimizer.step()
                     lr_scheduler.step()
-                    optimizer.zero_grad()
+                    optimizer.zero_grad(set_to_none=True)
+
+                loss_accum += loss.detach().float()
+                loss_count += 1
 
                 if accelerator.sync_gradients:
                     progress_bar.update(1)
                     global_step += 1
 
-                    if status_updater:
-                        progress_percent = (global_step / config.max_train_steps) * 100
-                        status_updater.update({
-                            "progress": round(progress_percent, 2),
-                            "message": f"Step {global_step}/{config.max_train_steps}"
-                        })
-
-                logs = {"loss": loss.detach().item(), "lr": lr_scheduler.get_last_lr()[0]}
-                progress_bar.set_postfix(**logs)
-                accelerator.log(logs, step=global_step)
+                    # .item() blocks until the GPU has caught up, so only pay for it (and
+                    # the status/log writes) every few steps rather than on every step.
+                    if global_step % config.logging_steps == 0 or global_step >= config.max_train_steps:
+                        logs = {"loss": (loss_accum / loss_count).item(), "lr": lr_scheduler.get_last_lr()[0]}
+                        loss_accum.zero_()
+                        loss_count = 0
+                        progress_bar.set_postfix(**logs)
+                        accelerator.log(logs, step=global_step)
+
+                        if status_updater:
+                            progress_percent = (global_step / config.max_train_steps) * 100
+                            status_updater.update({
+                                "progress": round(progress_percent, 2),
+                                "message": f"Step {global_step}/{config.max_train_steps}"
+                            })
 
                 if global_step >= config.max_train_steps:
                     break
@@ -412,6 +627,9 @@ def start_training(config: TrainingConfig, status_updater: Optional[dict] = None
         # Save the model only if training completed successfully
         if accelerator.is_main_process and not terminated:
             unet = accelerator.unwrap_model(unet)
+            # Newer accelerate keeps the torch.compile wrapper by default, which would
+            # save every LoRA key under an "_orig_mod." prefix that the loader ignores
+            unet = getattr(unet, "_orig_mod", unet)
             unet_lora_state_dict = convert_state_dict_to_diffusers(get_peft_model_state_dict(unet))
             
             StableDiffusionLoraLoaderMixin.save_lora_weights(
@@ -444,8 +662,8 @@ def start_training(config: TrainingConfig, status_updater: Optional[dict] = None
 
         # Cleanup
         del unet, text_encoder, vae, optimizer, train_dataloader, lr_scheduler, accelerator
+        # free_memory() already releases the allocator cache for whichever backend is active
         free_memory()
-        torch.cuda.empty_cache() if torch.cuda.is_available() else None
         gc.collect()
 
 def encode_prompt(text_encoder, input_ids, attention_mask, text_encoder_use_attention_mask=None):
@@ -32,7 +32,7 @@ const InferencePage: React.FC = () => {
     status: 'idle', 
     progress: 0, 
     step: 0, 
-    total_steps: 50, 
+    total_steps: 25, 
     message: '', 
     image_id: null 
   });
@@ -53,28 +53,19 @@ const InferencePage: React.FC = () => {
     fetchModels();
   }, []);
 
-  // Effect for polling
+  // Effect for polling. The server-wide status describes whichever batch is
+  // running, so it is only used to show progress; the result of our own request
+  // comes back from POST /generate.
   useEffect(() => {
     const pollStatus = async () => {
       try {
         const response = await axios.get('http://localhost:8000/generate/status');
         const newStatus: InferenceStatus = response.data;
-        setStatus(newStatus);
-
-        if (newStatus.status === 'completed') {
-          if (pollingInterval.current) clearInterval(pollingInterval.current);
-          setIsProcessing(false);
-          setGeneratedImage(`http://localhost:8000/generate/image/${newStatus.image_id}?t=${new Date().getTime()}`);
-          setSnackbar({ open: true, message: 'Image generated successfully!', severity: 'success' });
-        } else if (newStatus.status === 'failed') {
-          if (pollingInterval.current) clearInterval(pollingInterval.current);
-          setIsProcessing(false);
-          setSnackbar({ open: true, message: newStatus.message, severity: 'error' });
+        if (newStatus.status === 'loading' || newStatus.status === 'processing') {
+          setStatus(newStatus);
         }
       } catch (error) {
         console.error("Failed to poll status:", error);
-        if (pollingInterval.current) clearInterval(pollingInterval.current);
-        setIsProcessing(false);
       }
     };
 
@@ -101,17 +92,29 @@ const InferencePage: React.FC = () => {
     setStatus({ ...status, status: 'loading', message: 'Sending request to server...' });
 
     try {
-      await axios.post('http://localhost:8000/generate', {
+      // Resolves once this request's batch has finished, with this request's own image_id
+      const response = await axios.post('http://localhost:8000/generate', {
         prompt,
         negative_prompt: negativePrompt,
         lora_model: selectedLora === 'None' ? null : selectedLora,
       });
+      if (response.data.status === 'success') {
+        const imageId: string = response.data.image_id;
+        setStatus(prev => ({ ...prev, status: 'completed', progress: 100, message: response.data.message, image_id: imageId }));
+        setGeneratedImage(`http://localhost:8000/generate/image/${imageId}?t=${new Date().getTime()}`);
+        setSnackbar({ open: true, message: 'Image generated successfully!', severity: 'success' });
+      } else {
+        setStatus(prev => ({ ...prev, status: 'failed', message: response.data.message }));
+        setSnackbar({ open: true, message: response.data.message, severity: 'error' });
+      }
     } catch (error) {
       let message = 'An unknown error occurred.';
       if (axios.isAxiosError(error) && error.response) {
         message = error.response.data.detail || error.response.data.message || message;
       }
+      setStatus(prev => ({ ...prev, status: 'failed', message }));
       setSnackbar({ open: true, message, severity: 'error' });
+    } finally {
       setIsProcessing(false);
     }
   };